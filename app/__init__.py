@@ -3,6 +3,7 @@ import logging
 from flask import Flask
 from app.extensions import db
 from app.api import api_blueprint
+from app.cli import archive_command, sync_command
 from app.models import *
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -10,6 +11,8 @@ from sqlalchemy.exc import SQLAlchemyError
 def create_app(config=None):
     app = Flask(__name__)
     app.register_blueprint(api_blueprint, url_prefix="/api")
+    app.cli.add_command(archive_command)
+    app.cli.add_command(sync_command)
     # Log environment details
     logging.basicConfig(level=logging.DEBUG)
     logging.info(f"Creating app with config: {config}")
@@ -18,6 +21,9 @@ def create_app(config=None):
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("SQLALCHEMY_DATABASE_URI")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["SQLALCHEMY_ECHO"] = True
+    app.config["RESPONSE_COMPRESSION_MIN_BYTES"] = int(
+        os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024")
+    )
     logging.info(f"SQLALCHEMY_DATABASE_URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
 
     db.init_app(app)
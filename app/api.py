@@ -1,8 +1,24 @@
-from flask import Blueprint, jsonify, make_response, send_file
-from app.models import Service, Incident, Team, EscalationPolicy, User, Schedule
-from app.utils import fetch_and_store_all_data
+from flask import Blueprint, current_app, jsonify, make_response, request, send_file
+from app.models import Service, Incident, Team, User, Schedule
+from app.partitions import (
+    InvalidWindow,
+    filter_window,
+    parse_window,
+    read_archived_incidents,
+)
+from app.queries import (
+    ANALYTICS_QUERIES,
+    escalation_policies_query,
+    incidents_by_service_and_status_query,
+    incidents_per_service_query,
+    number_of_services_query,
+    run_batch,
+    service_with_most_incidents_query,
+    teams_and_services_query,
+)
+from app.utils import fetch_and_store_all_data, sync_failed
+from app.encoding import encode_response
 from app.extensions import db
-import asyncio
 import csv
 import matplotlib.pyplot as plt
 import io
@@ -11,6 +27,13 @@ from io import BytesIO
 # Define the blueprint for the API routes
 api_blueprint = Blueprint("api", __name__)
 
+
+@api_blueprint.errorhandler(InvalidWindow)
+def invalid_window(error):
+    """Returns a 400 response for malformed ``since``/``until`` parameters."""
+    return jsonify({"error": str(error)}), 400
+
+
 @api_blueprint.route("/number_of_services", methods=["GET"])
 def number_of_services():
     """
@@ -19,49 +42,31 @@ def number_of_services():
     Returns:
         JSON response with the number of services in the database.
     """
-    count = Service.query.count()
-    return jsonify({"number_of_services": count})
+    return jsonify(number_of_services_query(request.args))
 
 
 @api_blueprint.route("/incidents_per_service", methods=["GET"])
 def incidents_per_service():
     """
-    Fetches the number of incidents per service.
+    Fetches the number of incidents per service, optionally limited to the
+    ``since``/``until`` window.
 
     Returns:
         JSON response with the number of incidents for each service.
     """
-    results = (
-        db.session.query(Service.name, db.func.count(Incident.id))
-        .join(Incident, Incident.service_id == Service.id)
-        .group_by(Service.name)
-        .all()
-    )
-    return jsonify({"incidents_per_service": dict(results)})
+    return jsonify(incidents_per_service_query(request.args))
 
 
 @api_blueprint.route("/incidents_by_service_and_status", methods=["GET"])
 def incidents_by_service_and_status():
     """
-    Fetches the number of incidents grouped by service and status.
+    Fetches the number of incidents grouped by service and status, optionally
+    limited to the ``since``/``until`` window.
 
     Returns:
         JSON response with incidents count per service and status.
     """
-    results = (
-        db.session.query(Service.name, Incident.status, db.func.count(Incident.id))
-        .join(Incident, Incident.service_id == Service.id)
-        .group_by(Service.name, Incident.status)
-        .all()
-    )
-    return jsonify(
-        {
-            "incidents_by_service_and_status": [
-                {"service": row[0], "status": row[1], "count": row[2]}
-                for row in results
-            ]
-        }
-    )
+    return jsonify(incidents_by_service_and_status_query(request.args))
 
 
 @api_blueprint.route("/teams_and_services", methods=["GET"])
@@ -72,43 +77,43 @@ def teams_and_services():
     Returns:
         JSON response with the count of services associated with each team.
     """
-    results = (
-        db.session.query(Team.name, db.func.count(Service.id))
-        .join(Service, Service.teams.any(Team.id == Team.id))
-        .group_by(Team.name)
-        .all()
-    )
-    return jsonify(
-        {
-            "teams_and_services": [
-                {"team": row[0], "services_count": row[1]} for row in results
-            ]
-        }
-    )
+    return jsonify(teams_and_services_query(request.args))
 
 
 @api_blueprint.route("/generate_report", methods=["GET"])
 def generate_csv_report():
     """
-    Generates a CSV report of the number of incidents per service.
+    Generates a CSV report of the number of incidents per service, optionally
+    limited to the ``since``/``until`` window. Archived incidents are included.
 
     Returns:
         CSV file as an attachment in the HTTP response.
     """
+    since, until = parse_window(request.args)
     results = (
-        db.session.query(
-            Service.name, db.func.count(Incident.id).label("incident_count")
+        filter_window(
+            db.session.query(
+                Service.name, db.func.count(Incident.id).label("incident_count")
+            ).join(Incident),
+            since,
+            until,
         )
-        .join(Incident)
         .group_by(Service.name)
         .all()
     )
+    counts = dict(results)
+
+    # Add the archived months that overlap the requested window
+    archived = read_archived_incidents(since, until)
+    for service_name, count in archived.groupby("service_name").size().items():
+        counts[service_name] = counts.get(service_name, 0) + int(count)
+
     output = io.StringIO()
     writer = csv.writer(output)
     writer.writerow(["Service", "Number of Incidents"])
 
-    for row in results:
-        writer.writerow([row[0], row[1]])
+    for service_name, count in counts.items():
+        writer.writerow([service_name, count])
 
     response = make_response(output.getvalue())
     response.headers["Content-Disposition"] = "attachment; filename=report.csv"
@@ -120,23 +125,13 @@ def generate_csv_report():
 @api_blueprint.route("/service_with_most_incidents", methods=["GET"])
 def service_with_most_incidents():
     """
-    Fetches the service with the most incidents.
+    Fetches the service with the most incidents, optionally limited to the
+    ``since``/``until`` window.
 
     Returns:
         JSON response with the service that has the most incidents and the number of incidents.
     """
-    results = (
-        db.session.query(
-            Service.name, db.func.count(Incident.id).label("incident_count")
-        )
-        .join(Incident, Incident.service_id == Service.id)
-        .group_by(Service.name)
-        .order_by(db.func.count(Incident.id).desc())
-        .first()
-    )
-    return jsonify(
-        {"service_with_most_incidents": results[0], "incident_count": results[1]}
-    )
+    return jsonify(service_with_most_incidents_query(request.args))
 
 
 @api_blueprint.route("/incidents_graph", methods=["GET"])
@@ -178,18 +173,9 @@ def escalation_policies():
     Fetches all escalation policies.
 
     Returns:
-        JSON response with all escalation policies.
+        JSON or MessagePack response with all escalation policies.
     """
-    results = db.session.query(
-        EscalationPolicy.id, EscalationPolicy.name, EscalationPolicy.description
-    ).all()
-    return jsonify(
-        {
-            "escalation_policies": [
-                {"id": row[0], "name": row[1], "description": row[2]} for row in results
-            ]
-        }
-    )
+    return encode_response(escalation_policies_query(request.args))
 
 
 @api_blueprint.route("/services", methods=["GET"])
@@ -198,22 +184,27 @@ def get_services():
     Fetches all services.
 
     Returns:
-        JSON response with all services.
+        JSON or MessagePack response with all services.
     """
-    services = Service.query.all()
-    return jsonify([{"id": s.id, "name": s.name} for s in services])
+    services = db.session.query(Service.id, Service.name).all()
+    return encode_response([{"id": s.id, "name": s.name} for s in services])
 
 
 @api_blueprint.route("/incidents", methods=["GET"])
 def get_incidents():
     """
-    Fetches all incidents.
+    Fetches all incidents, optionally limited to the ``since``/``until`` window.
 
     Returns:
-        JSON response with all incidents.
+        JSON or MessagePack response with all incidents.
     """
-    incidents = Incident.query.all()
-    return jsonify(
+    since, until = parse_window(request.args)
+    incidents = filter_window(
+        db.session.query(Incident.id, Incident.status, Incident.service_id),
+        since,
+        until,
+    ).all()
+    return encode_response(
         [
             {"id": i.id, "status": i.status, "service_id": i.service_id}
             for i in incidents
@@ -227,21 +218,78 @@ def get_teams():
     Fetches all teams.
 
     Returns:
-        JSON response with all teams.
+        JSON or MessagePack response with all teams.
     """
-    teams = Team.query.all()
-    return jsonify([{"id": t.id, "name": t.name} for t in teams])
+    teams = db.session.query(Team.id, Team.name).all()
+    return encode_response([{"id": t.id, "name": t.name} for t in teams])
+
+
+@api_blueprint.route("/batch", methods=["POST"])
+def batch():
+    """
+    Runs several analytics queries in one round trip.
+
+    Expects a JSON body such as::
+
+        {"queries": [
+            "number_of_services",
+            {"name": "incidents_per_service", "params": {"since": "2024-01-01"}},
+            {"key": "last_month", "name": "service_with_most_incidents",
+             "params": {"since": "2024-05-01", "until": "2024-06-01"}}
+        ]}
+
+    ``key`` defaults to ``name`` and must be unique within the batch.
+
+    Returns:
+        JSON or MessagePack response with the result of each query under its key, all
+        read from the same snapshot.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    entries = body.get("queries")
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "'queries' must be a non-empty list"}), 400
+
+    queries = []
+    keys = set()
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"name": entry}
+        if not isinstance(entry, dict):
+            return jsonify({"error": f"Invalid query entry: {entry!r}"}), 400
+        name = entry.get("name")
+        if not isinstance(name, str) or name not in ANALYTICS_QUERIES:
+            return jsonify({"error": f"Unknown query: {name!r}"}), 400
+        key = entry.get("key", name)
+        if not isinstance(key, str):
+            return jsonify({"error": f"Invalid query key: {key!r}"}), 400
+        if key in keys:
+            return jsonify({"error": f"Duplicate query key: {key}"}), 400
+        keys.add(key)
+        params = entry.get("params") or {}
+        if not isinstance(params, dict) or not all(
+            isinstance(value, str) for value in params.values()
+        ):
+            return jsonify({"error": f"Invalid params for query: {key}"}), 400
+        queries.append((key, name, params))
+
+    return encode_response({"results": run_batch(queries)})
 
 
 @api_blueprint.route("/fetch_data", methods=["POST"])
 def fetch_data():
     """
-    Fetches and stores all data asynchronously by calling the fetch_and_store_all_data function.
+    Fetches and stores all data with the sync workers by calling the fetch_and_store_all_data function.
 
     Returns:
-        JSON response with a success message upon completion.
+        JSON response with a status message and the inserted/updated/unchanged
+        counts per resource; 500 if any page failed to be fetched or stored.
     """
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(fetch_and_store_all_data())
-    return jsonify({"message": "Data fetched and stored successfully"}), 200
+    counts = fetch_and_store_all_data(current_app._get_current_object())
+    if sync_failed(counts):
+        return jsonify({"message": "Some pages failed to sync", "sync": counts}), 500
+    return (
+        jsonify({"message": "Data fetched and stored successfully", "sync": counts}),
+        200,
+    )
@@ -0,0 +1,64 @@
+import os
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app import partitions
+from app.partitions import archive_incidents, INCIDENT_RETENTION_MONTHS
+from app.utils import fetch_and_store_all_data, sync_failed, SYNC_STAGES, SYNC_WORKERS
+
+
+@click.command("pd-archive")
+@click.option(
+    "--retention-months",
+    default=INCIDENT_RETENTION_MONTHS,
+    show_default=True,
+    type=int,
+    help="Number of months of incidents to keep in the database.",
+)
+@with_appcontext
+def archive_command(retention_months):
+    """Move incidents older than the retention window into Parquet archives."""
+    # Archived rows are deleted from the database, so the files must live on
+    # persistent storage rather than wherever the command happens to run
+    if not os.path.isabs(partitions.INCIDENT_ARCHIVE_DIR):
+        raise click.UsageError(
+            f"INCIDENT_ARCHIVE_DIR is a relative path "
+            f"({partitions.INCIDENT_ARCHIVE_DIR}); set it to an absolute directory "
+            "on persistent storage."
+        )
+    archived = archive_incidents(retention_months)
+    if not archived:
+        click.echo("No incidents to archive.")
+        return
+    for month, count in archived.items():
+        click.echo(f"Archived {count} incidents from {month}.")
+
+
+@click.command("pd-sync")
+@click.option(
+    "--workers",
+    default=SYNC_WORKERS,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of worker threads fetching and storing pages.",
+)
+@click.option(
+    "--resource",
+    "resources",
+    multiple=True,
+    type=click.Choice([endpoint for stage in SYNC_STAGES for endpoint in stage]),
+    help="Resource to sync; repeat for several. Defaults to all resources.",
+)
+@with_appcontext
+def sync_command(workers, resources):
+    """Fetch and store PagerDuty data with a pool of sync workers."""
+    results = fetch_and_store_all_data(
+        current_app._get_current_object(), workers, resources or None
+    )
+    for endpoint, counts in results.items():
+        click.echo(
+            f"{endpoint}: {counts['inserted']} inserted, {counts['updated']} updated, "
+            f"{counts['unchanged']} unchanged, {counts['failed_pages']} failed pages"
+        )
+    if sync_failed(results):
+        raise click.exceptions.Exit(1)
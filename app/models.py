@@ -1,6 +1,4 @@
-from flask_sqlalchemy import SQLAlchemy
-
-db = SQLAlchemy()
+from app.extensions import db
 
 # Association table for many-to-many relationship between escalation policies and services
 escalation_policy_service = db.Table(
@@ -46,6 +44,7 @@ class EscalationPolicy(db.Model):
     description = db.Column(db.Text, nullable=True)
     num_loops = db.Column(db.Integer, nullable=True)
     on_call_handoff_notifications = db.Column(db.String(50), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)
 
     # Relationships
     escalation_rules = db.relationship(
@@ -102,6 +101,7 @@ class Service(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(50), nullable=False)
     html_url = db.Column(db.String(255), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)
 
     # Many-to-many relationship with Team
     teams = db.relationship("Team", secondary=service_team, back_populates="services")
@@ -125,6 +125,7 @@ class Team(db.Model):
     name = db.Column(db.String(255), nullable=False)
     summary = db.Column(db.String(255))
     html_url = db.Column(db.String(255), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)
 
     # Many-to-many relationship with Service
     services = db.relationship(
@@ -144,9 +145,11 @@ class Incident(db.Model):
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=True)
     status = db.Column(db.String(50), nullable=False)
-    created_at = db.Column(db.DateTime, nullable=False)
+    # Indexed so time-windowed queries only scan the requested months
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
     updated_at = db.Column(db.DateTime, nullable=False)
     incident_key = db.Column(db.String(255), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)
 
     service_id = db.Column(db.String(50), db.ForeignKey("services.id"), nullable=False)
     # Backref renamed to avoid conflict with incidents
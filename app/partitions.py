@@ -0,0 +1,201 @@
+import os
+import glob
+import logging
+from datetime import datetime, timezone
+import pandas as pd
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import db, Incident, Service
+
+# Archive configuration
+INCIDENT_ARCHIVE_DIR = os.getenv("INCIDENT_ARCHIVE_DIR", "archive/incidents")
+INCIDENT_RETENTION_MONTHS = int(os.getenv("INCIDENT_RETENTION_MONTHS", "12"))
+
+# Columns written to each monthly archive file
+ARCHIVE_COLUMNS = [
+    "id",
+    "incident_number",
+    "title",
+    "status",
+    "created_at",
+    "updated_at",
+    "incident_key",
+    "service_id",
+    "service_name",
+]
+
+
+class InvalidWindow(ValueError):
+    """Raised when the ``since``/``until`` query parameters cannot be parsed."""
+
+
+def month_start(value):
+    """Returns the first instant of the month containing ``value``."""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    """Returns the start of the month ``months`` months after the month of ``value``."""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def parse_window(args):
+    """
+    Parses the optional ``since`` and ``until`` query parameters.
+
+    Both accept ISO 8601 dates or datetimes; aware values are converted to naive UTC,
+    which is how incident timestamps are stored.
+
+    Returns:
+        A ``(since, until)`` tuple where missing bounds are ``None``.
+    """
+    window = []
+    for key in ("since", "until"):
+        raw = args.get(key)
+        if not raw:
+            window.append(None)
+            continue
+        if not isinstance(raw, str):
+            raise InvalidWindow(f"Invalid '{key}' value: {raw!r}")
+        try:
+            value = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+        except ValueError:
+            raise InvalidWindow(f"Invalid '{key}' value: {raw}")
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        window.append(value)
+    return tuple(window)
+
+
+def filter_window(query, since=None, until=None):
+    """
+    Restricts an incidents query to ``since <= created_at < until``.
+
+    The range predicate is on the indexed ``created_at`` column, so hot-window queries
+    only touch the months they ask for instead of scanning all of history.
+    """
+    if since is not None:
+        query = query.filter(Incident.created_at >= since)
+    if until is not None:
+        query = query.filter(Incident.created_at < until)
+    return query
+
+
+def archive_path(month):
+    """Returns the archive file path for the month starting at ``month``."""
+    return os.path.join(INCIDENT_ARCHIVE_DIR, f"incidents-{month:%Y-%m}.parquet")
+
+
+def archived_months(since=None, until=None):
+    """
+    Lists the monthly archive files that overlap the requested window.
+
+    Months entirely outside ``[since, until)`` are pruned by file name, so their
+    contents are never read.
+    """
+    paths = []
+    pattern = os.path.join(INCIDENT_ARCHIVE_DIR, "incidents-*.parquet")
+    for path in sorted(glob.glob(pattern)):
+        name = os.path.basename(path)[len("incidents-") : -len(".parquet")]
+        try:
+            month = datetime.strptime(name, "%Y-%m")
+        except ValueError:
+            continue
+        if since is not None and add_months(month, 1) <= since:
+            continue
+        if until is not None and month >= until:
+            continue
+        paths.append(path)
+    return paths
+
+
+def read_archived_incidents(since=None, until=None):
+    """
+    Reads archived incidents inside the requested window.
+
+    Returns:
+        A DataFrame with the ``ARCHIVE_COLUMNS`` columns.
+    """
+    paths = archived_months(since, until)
+    if not paths:
+        return pd.DataFrame(columns=ARCHIVE_COLUMNS)
+    frame = pd.concat(
+        [pd.read_parquet(path, columns=ARCHIVE_COLUMNS) for path in paths],
+        ignore_index=True,
+    )
+    if since is not None:
+        frame = frame[frame["created_at"] >= since]
+    if until is not None:
+        frame = frame[frame["created_at"] < until]
+    return frame
+
+
+def archive_incidents(retention_months=INCIDENT_RETENTION_MONTHS, now=None):
+    """
+    Moves incidents older than the retention window into monthly Parquet files.
+
+    Each month is written to a zstd-compressed file first and only then deleted from
+    the ``incidents`` table, one transaction per month. Re-running the job merges new
+    rows into an existing month file.
+
+    Returns:
+        Dict mapping each archived month (``YYYY-MM``) to the number of rows moved.
+    """
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+    oldest = (
+        db.session.query(db.func.min(Incident.created_at))
+        .filter(Incident.created_at < cutoff)
+        .scalar()
+    )
+    archived = {}
+    if oldest is None:
+        return archived
+
+    os.makedirs(INCIDENT_ARCHIVE_DIR, exist_ok=True)
+    month = month_start(oldest)
+    while month < cutoff:
+        next_month = add_months(month, 1)
+        rows = filter_window(
+            db.session.query(
+                Incident.id,
+                Incident.incident_number,
+                Incident.title,
+                Incident.status,
+                Incident.created_at,
+                Incident.updated_at,
+                Incident.incident_key,
+                Incident.service_id,
+                Service.name,
+            ).outerjoin(Service, Service.id == Incident.service_id),
+            month,
+            next_month,
+        ).all()
+
+        if rows:
+            frame = pd.DataFrame([tuple(row) for row in rows], columns=ARCHIVE_COLUMNS)
+            path = archive_path(month)
+            if os.path.exists(path):
+                frame = pd.concat(
+                    [pd.read_parquet(path), frame], ignore_index=True
+                ).drop_duplicates("id", keep="last")
+            tmp_path = f"{path}.tmp"
+            frame.to_parquet(tmp_path, compression="zstd", index=False)
+            os.replace(tmp_path, path)
+
+            # Delete exactly the rows that were written, not the month window again:
+            # rows added to the month since the SELECT stay for the next run
+            ids = [row.id for row in rows]
+            try:
+                for start in range(0, len(ids), 1000):
+                    Incident.query.filter(
+                        Incident.id.in_(ids[start : start + 1000])
+                    ).delete(synchronize_session=False)
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                raise
+            archived[f"{month:%Y-%m}"] = len(rows)
+            logging.info(f"Archived {len(rows)} incidents from {month:%Y-%m} to {path}")
+
+        month = next_month
+    return archived
@@ -0,0 +1,162 @@
+from app.models import Service, Incident, Team, EscalationPolicy
+from app.partitions import filter_window, parse_window
+from app.extensions import db
+
+
+def number_of_services_query(params):
+    """
+    Counts the services.
+
+    Returns:
+        Dict with the number of services in the database.
+    """
+    count = db.session.query(db.func.count(Service.id)).scalar()
+    return {"number_of_services": count}
+
+
+def incidents_per_service_query(params):
+    """
+    Counts incidents per service, optionally limited to the ``since``/``until`` window.
+
+    Returns:
+        Dict with the number of incidents for each service.
+    """
+    since, until = parse_window(params)
+    results = (
+        filter_window(
+            db.session.query(Service.name, db.func.count(Incident.id)).join(
+                Incident, Incident.service_id == Service.id
+            ),
+            since,
+            until,
+        )
+        .group_by(Service.name)
+        .all()
+    )
+    return {"incidents_per_service": dict(results)}
+
+
+def incidents_by_service_and_status_query(params):
+    """
+    Counts incidents grouped by service and status, optionally limited to the
+    ``since``/``until`` window.
+
+    Returns:
+        Dict with incidents count per service and status.
+    """
+    since, until = parse_window(params)
+    results = (
+        filter_window(
+            db.session.query(
+                Service.name, Incident.status, db.func.count(Incident.id)
+            ).join(Incident, Incident.service_id == Service.id),
+            since,
+            until,
+        )
+        .group_by(Service.name, Incident.status)
+        .all()
+    )
+    return {
+        "incidents_by_service_and_status": [
+            {"service": row[0], "status": row[1], "count": row[2]} for row in results
+        ]
+    }
+
+
+def teams_and_services_query(params):
+    """
+    Counts the services per team.
+
+    Returns:
+        Dict with the count of services associated with each team.
+    """
+    results = (
+        db.session.query(Team.name, db.func.count(Service.id))
+        .join(Service, Service.teams.any(Team.id == Team.id))
+        .group_by(Team.name)
+        .all()
+    )
+    return {
+        "teams_and_services": [
+            {"team": row[0], "services_count": row[1]} for row in results
+        ]
+    }
+
+
+def service_with_most_incidents_query(params):
+    """
+    Finds the service with the most incidents, optionally limited to the
+    ``since``/``until`` window.
+
+    Returns:
+        Dict with the service that has the most incidents and the number of incidents.
+    """
+    since, until = parse_window(params)
+    results = (
+        filter_window(
+            db.session.query(
+                Service.name, db.func.count(Incident.id).label("incident_count")
+            ).join(Incident, Incident.service_id == Service.id),
+            since,
+            until,
+        )
+        .group_by(Service.name)
+        .order_by(db.func.count(Incident.id).desc())
+        .first()
+    )
+    if results is None:
+        return {"service_with_most_incidents": None, "incident_count": 0}
+    return {"service_with_most_incidents": results[0], "incident_count": results[1]}
+
+
+def escalation_policies_query(params):
+    """
+    Lists all escalation policies.
+
+    Returns:
+        Dict with all escalation policies.
+    """
+    results = db.session.query(
+        EscalationPolicy.id, EscalationPolicy.name, EscalationPolicy.description
+    ).all()
+    return {
+        "escalation_policies": [
+            {"id": row[0], "name": row[1], "description": row[2]} for row in results
+        ]
+    }
+
+
+# Queries that can be requested through POST /api/batch
+ANALYTICS_QUERIES = {
+    "number_of_services": number_of_services_query,
+    "incidents_per_service": incidents_per_service_query,
+    "incidents_by_service_and_status": incidents_by_service_and_status_query,
+    "teams_and_services": teams_and_services_query,
+    "service_with_most_incidents": service_with_most_incidents_query,
+    "escalation_policies": escalation_policies_query,
+}
+
+
+def run_batch(queries):
+    """
+    Runs several analytics queries in a single read transaction.
+
+    All queries run on ``db.session`` and so share one connection. On MySQL and PostgreSQL the transaction runs at
+    REPEATABLE READ, so every query sees the same snapshot of the data.
+
+    Args:
+        queries: List of ``(key, name, params)`` tuples; ``name`` must be a key of
+            ``ANALYTICS_QUERIES``.
+
+    Returns:
+        Dict mapping each key to the result of its query.
+    """
+    if db.engine.dialect.name in ("mysql", "postgresql"):
+        db.session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    try:
+        return {
+            key: ANALYTICS_QUERIES[name](params) for key, name, params in queries
+        }
+    finally:
+        # Nothing was written, just release the snapshot
+        db.session.rollback()
@@ -1,8 +1,10 @@
 import unittest
+from datetime import datetime
 from flask import Flask
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch
 from app.api import api_blueprint
 from app.extensions import db
+from app.models import Service, Incident, Team, EscalationPolicy
 import os
 
 class TestApiBlueprint(unittest.TestCase):
@@ -70,17 +72,149 @@ class TestApiBlueprint(unittest.TestCase):
             },
         )
 
-    @patch("app.api.fetch_data", new_callable=AsyncMock)
+    @patch("app.api.fetch_and_store_all_data")
     def test_fetch_and_store_data(self, mock_fetch_and_store_all_data):
         """Test the /fetch_data API endpoint."""
+        mock_fetch_and_store_all_data.return_value = {
+            "teams": {"inserted": 1, "updated": 0, "unchanged": 0, "failed_pages": 0}
+        }
         response = self.client.post("/api/fetch_data")
         self.assertEqual(response.status_code, 200)
 
+    @patch("app.api.fetch_and_store_all_data")
+    def test_fetch_and_store_data_failed_pages(self, mock_fetch_and_store_all_data):
+        """Test that the /fetch_data API endpoint reports failed pages."""
+        mock_fetch_and_store_all_data.return_value = {
+            "teams": {"inserted": 0, "updated": 0, "unchanged": 0, "failed_pages": 1}
+        }
+        response = self.client.post("/api/fetch_data")
+        self.assertEqual(response.status_code, 500)
+
+    def test_batch_unknown_query(self):
+        """Test that the /batch API endpoint rejects unknown query names."""
+        response = self.client.post("/api/batch", json={"queries": ["unknown"]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_malformed_body(self):
+        """Test that the /batch API endpoint rejects malformed bodies with a 400."""
+        for body in [
+            ["number_of_services"],
+            {"queries": [{"name": ["number_of_services"]}]},
+            {"queries": [{"name": "number_of_services", "key": ["a"]}]},
+            {"queries": [{"name": "incidents_per_service", "params": {"since": 1}}]},
+        ]:
+            response = self.client.post("/api/batch", json=body)
+            self.assertEqual(response.status_code, 400, body)
+
     def test_generate_report(self):
         """Test the /generate_report API endpoint."""
         response = self.client.get("/api/generate_report")
         self.assertEqual(response.status_code, 200)
 
 
+class TestBatch(unittest.TestCase):
+    """Test cases for the /batch API endpoint against a SQLite database"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(self.app)
+        self.app.register_blueprint(api_blueprint, url_prefix="/api")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        team = Team(id="T1", name="Team 1")
+        for service_id in ("S1", "S2"):
+            db.session.add(
+                Service(
+                    id=service_id,
+                    name=f"Service {service_id[1]}",
+                    created_at=datetime(2024, 1, 1),
+                    updated_at=datetime(2024, 1, 1),
+                    status="active",
+                    teams=[team],
+                )
+            )
+        for number, (service_id, status, created_at) in enumerate(
+            [
+                ("S1", "resolved", datetime(2024, 1, 10)),
+                ("S1", "triggered", datetime(2024, 3, 5)),
+                ("S1", "triggered", datetime(2024, 3, 6)),
+                ("S2", "resolved", datetime(2024, 3, 7)),
+            ]
+        ):
+            db.session.add(
+                Incident(
+                    id=f"I{number}",
+                    incident_number=number,
+                    title=f"Incident {number}",
+                    status=status,
+                    created_at=created_at,
+                    updated_at=created_at,
+                    service_id=service_id,
+                )
+            )
+        db.session.add(EscalationPolicy(id="E1", name="Policy", summary="Policy"))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_batch(self):
+        """Test that the /batch API endpoint returns each query's real result."""
+        response = self.client.post(
+            "/api/batch",
+            json={
+                "queries": [
+                    "number_of_services",
+                    "incidents_per_service",
+                    "teams_and_services",
+                    "escalation_policies",
+                    {"key": "top", "name": "service_with_most_incidents"},
+                    {
+                        "key": "february_on",
+                        "name": "incidents_by_service_and_status",
+                        "params": {"since": "2024-02-01"},
+                    },
+                ]
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json["results"]
+        self.assertEqual(results["number_of_services"], {"number_of_services": 2})
+        self.assertEqual(
+            results["incidents_per_service"],
+            {"incidents_per_service": {"Service 1": 3, "Service 2": 1}},
+        )
+        self.assertEqual(
+            results["teams_and_services"],
+            {"teams_and_services": [{"team": "Team 1", "services_count": 2}]},
+        )
+        self.assertEqual(
+            results["escalation_policies"],
+            {
+                "escalation_policies": [
+                    {"id": "E1", "name": "Policy", "description": None}
+                ]
+            },
+        )
+        self.assertEqual(
+            results["top"],
+            {"service_with_most_incidents": "Service 1", "incident_count": 3},
+        )
+        self.assertEqual(
+            sorted(
+                (row["service"], row["status"], row["count"])
+                for row in results["february_on"]["incidents_by_service_and_status"]
+            ),
+            [("Service 1", "triggered", 2), ("Service 2", "resolved", 1)],
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
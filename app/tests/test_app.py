@@ -7,8 +7,9 @@ import os
 class TestAppInitialization(unittest.TestCase):
     """Test cases for Flask app initialization in __init__.py"""
 
+    @patch("app.extensions.db.create_all")
     @patch("app.extensions.db.init_app")
-    def test_create_app(self, mock_init_app):
+    def test_create_app(self, mock_init_app, mock_create_all):
         """Test the app initialization, configuration, and blueprint registration."""
         from app import create_app
 
@@ -0,0 +1,62 @@
+import unittest
+import gzip
+import json
+import brotli
+import msgpack
+from flask import Flask
+from app.encoding import encode_response
+
+
+class TestEncoding(unittest.TestCase):
+    """Test cases for response content negotiation in encoding.py"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["RESPONSE_COMPRESSION_MIN_BYTES"] = 100
+        self.payload = [{"id": f"Q{n}", "status": "resolved"} for n in range(50)]
+
+    def encode(self, headers):
+        with self.app.test_request_context("/", headers=headers):
+            return encode_response(self.payload)
+
+    def test_json_default(self):
+        """Test that JSON is returned uncompressed without negotiation headers."""
+        response = self.encode({})
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(json.loads(response.get_data()), self.payload)
+
+    def test_json_utf8(self):
+        """Test that non-ASCII text is sent as raw UTF-8 with sorted keys."""
+        self.payload = [{"name": "é", "id": "Q1"}]
+        response = self.encode({})
+        self.assertEqual(response.get_data(), '[{"id":"Q1","name":"é"}]'.encode("utf-8"))
+
+    def test_msgpack_gzip(self):
+        """Test MessagePack negotiation with gzip compression."""
+        response = self.encode(
+            {"Accept": "application/msgpack", "Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response.mimetype, "application/msgpack")
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(
+            msgpack.unpackb(gzip.decompress(response.get_data())), self.payload
+        )
+
+    def test_brotli_preferred(self):
+        """Test that brotli is preferred when the client accepts both codings."""
+        response = self.encode({"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response.headers["Content-Encoding"], "br")
+        self.assertEqual(
+            json.loads(brotli.decompress(response.get_data())), self.payload
+        )
+
+    def test_small_body_not_compressed(self):
+        """Test that bodies below the threshold are sent uncompressed."""
+        self.payload = {"status": "ok"}
+        response = self.encode({"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
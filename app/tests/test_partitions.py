@@ -0,0 +1,189 @@
+import unittest
+import os
+import tempfile
+from datetime import datetime
+from unittest.mock import patch
+from flask import Flask
+from app.api import api_blueprint
+from app.cli import archive_command
+from app.models import db, Incident, Service
+from app.partitions import (
+    InvalidWindow,
+    add_months,
+    archive_incidents,
+    archived_months,
+    month_start,
+    parse_window,
+    read_archived_incidents,
+)
+
+
+class TestPartitions(unittest.TestCase):
+    """Test cases for the monthly partitioning helpers in partitions.py"""
+
+    def test_month_arithmetic(self):
+        """Test month boundaries across year ends."""
+        self.assertEqual(month_start(datetime(2024, 3, 17, 8, 30)), datetime(2024, 3, 1))
+        self.assertEqual(add_months(datetime(2024, 11, 5), 2), datetime(2025, 1, 1))
+        self.assertEqual(add_months(datetime(2024, 1, 31), -1), datetime(2023, 12, 1))
+
+    def test_parse_window(self):
+        """Test parsing of the since/until query parameters."""
+        since, until = parse_window(
+            {"since": "2024-01-01", "until": "2024-02-01T12:00:00Z"}
+        )
+        self.assertEqual(since, datetime(2024, 1, 1))
+        self.assertEqual(until, datetime(2024, 2, 1, 12))
+        self.assertEqual(parse_window({}), (None, None))
+        with self.assertRaises(InvalidWindow):
+            parse_window({"since": "last week"})
+
+    def test_archived_months_pruning(self):
+        """Test that archive files outside the window are skipped."""
+        with tempfile.TemporaryDirectory() as archive_dir:
+            for name in ("2023-11", "2023-12", "2024-01"):
+                open(os.path.join(archive_dir, f"incidents-{name}.parquet"), "w").close()
+
+            with patch("app.partitions.INCIDENT_ARCHIVE_DIR", archive_dir):
+                paths = archived_months(datetime(2023, 12, 15), datetime(2024, 1, 1))
+                self.assertEqual(
+                    [os.path.basename(path) for path in paths],
+                    ["incidents-2023-12.parquet"],
+                )
+                self.assertEqual(len(archived_months()), 3)
+
+
+class TestArchival(unittest.TestCase):
+    """Test cases for incident archival against a SQLite database"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(self.app)
+        self.app.register_blueprint(api_blueprint, url_prefix="/api")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.patcher_dir = patch(
+            "app.partitions.INCIDENT_ARCHIVE_DIR", self.archive_dir.name
+        )
+        self.patcher_dir.start()
+
+        db.session.add(
+            Service(
+                id="S1",
+                name="Service 1",
+                created_at=datetime(2022, 1, 1),
+                updated_at=datetime(2022, 1, 1),
+                status="active",
+            )
+        )
+        for number, created_at in enumerate(
+            [
+                datetime(2023, 1, 5),
+                datetime(2023, 1, 20),
+                datetime(2023, 2, 10),
+                datetime(2024, 6, 1),
+            ]
+        ):
+            self.add_incident(number, created_at)
+        db.session.commit()
+
+    def tearDown(self):
+        self.patcher_dir.stop()
+        self.archive_dir.cleanup()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_incident(self, number, created_at):
+        db.session.add(
+            Incident(
+                id=f"I{number}",
+                incident_number=number,
+                title=f"Incident {number}",
+                status="resolved",
+                created_at=created_at,
+                updated_at=created_at,
+                service_id="S1",
+            )
+        )
+
+    def test_archive_incidents(self):
+        """Test that old months are written to archive files and deleted."""
+        archived = archive_incidents(12, now=datetime(2024, 7, 15))
+        self.assertEqual(archived, {"2023-01": 2, "2023-02": 1})
+        self.assertEqual([row.id for row in Incident.query.all()], ["I3"])
+        self.assertEqual(
+            [os.path.basename(path) for path in archived_months()],
+            ["incidents-2023-01.parquet", "incidents-2023-02.parquet"],
+        )
+
+    def test_archive_incidents_merges_existing_month(self):
+        """Test that re-running the job merges rows into an existing month file."""
+        archive_incidents(12, now=datetime(2024, 7, 15))
+        self.add_incident(4, datetime(2023, 1, 25))
+        db.session.commit()
+
+        archived = archive_incidents(12, now=datetime(2024, 7, 15))
+        self.assertEqual(archived, {"2023-01": 1})
+        frame = read_archived_incidents(datetime(2023, 1, 1), datetime(2023, 2, 1))
+        self.assertEqual(sorted(frame["id"]), ["I0", "I1", "I4"])
+
+    def test_archive_keeps_rows_added_during_run(self):
+        """Test that rows inserted after the month was read are not deleted."""
+        real_replace = os.replace
+
+        def replace_then_insert(src, dst):
+            real_replace(src, dst)
+            if dst.endswith("incidents-2023-01.parquet"):
+                self.add_incident(5, datetime(2023, 1, 28))
+                db.session.commit()
+
+        with patch("app.partitions.os.replace", side_effect=replace_then_insert):
+            archived = archive_incidents(12, now=datetime(2024, 7, 15))
+        self.assertEqual(archived["2023-01"], 2)
+        self.assertEqual(sorted(row.id for row in Incident.query.all()), ["I3", "I5"])
+
+    def test_archive_command_requires_absolute_dir(self):
+        """Test that the archive command refuses a relative archive directory."""
+        runner = self.app.test_cli_runner()
+        with patch("app.partitions.INCIDENT_ARCHIVE_DIR", "archive/incidents"):
+            result = runner.invoke(archive_command, ["--retention-months", "12"])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertEqual(Incident.query.count(), 4)
+
+        result = runner.invoke(archive_command, ["--retention-months", "12"])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+    def test_read_archived_incidents_window(self):
+        """Test that archived rows are filtered to the requested window."""
+        archive_incidents(12, now=datetime(2024, 7, 15))
+        frame = read_archived_incidents(datetime(2023, 1, 10), datetime(2023, 2, 28))
+        self.assertEqual(sorted(frame["id"]), ["I1", "I2"])
+        self.assertEqual(set(frame["service_name"]), {"Service 1"})
+        self.assertEqual(len(read_archived_incidents(datetime(2024, 1, 1))), 0)
+
+    def test_generate_report_includes_archive(self):
+        """Test that the CSV export adds archived incidents to live ones."""
+        archive_incidents(12, now=datetime(2024, 7, 15))
+        response = self.client.get("/api/generate_report")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data.decode().splitlines(),
+            ["Service,Number of Incidents", "Service 1,4"],
+        )
+
+        response = self.client.get("/api/generate_report?until=2023-02-01")
+        self.assertEqual(
+            response.data.decode().splitlines(),
+            ["Service,Number of Incidents", "Service 1,2"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
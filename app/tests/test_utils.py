@@ -1,9 +1,19 @@
 import unittest
-from unittest.mock import patch, AsyncMock
-import asyncio
+from unittest.mock import Mock, patch
+from sqlalchemy.exc import IntegrityError
 from flask import Flask
-from app.utils import fetch_and_store_all_data
+from app.utils import (
+    fetch_and_store_all_data,
+    content_hash,
+    new_sync_counts,
+    store_incidents,
+    store_page,
+    store_services,
+    store_teams,
+)
+from app.cli import sync_command
 from app.extensions import db
+from app.models import Service, Team, Incident
 import os
 
 class TestUtils(unittest.TestCase):
@@ -20,18 +30,175 @@ class TestUtils(unittest.TestCase):
     def tearDown(self):
         self.app_context.pop()
 
-    @patch("app.utils.fetch_and_store_services", new_callable=AsyncMock)
-    @patch("app.utils.fetch_and_store_incidents", new_callable=AsyncMock)
-    @patch("app.utils.fetch_and_store_teams", new_callable=AsyncMock)
-    @patch("app.utils.fetch_and_store_escalation_policies", new_callable=AsyncMock)
-    def test_fetch_and_store_all_data(
-        self, mock_services, mock_incidents, mock_teams, mock_policies
-    ):
-        asyncio.run(fetch_and_store_all_data())
-        mock_services.assert_called_once()
-        mock_incidents.assert_called_once()
-        mock_teams.assert_called_once()
-        mock_policies.assert_called_once()
+    @patch("app.utils.submit_resource", return_value=([], 0))
+    def test_fetch_and_store_all_data(self, mock_submit_resource):
+        """Test that teams and services are synced before incidents."""
+        results = fetch_and_store_all_data(self.app, workers=2)
+        endpoints = [call.args[2] for call in mock_submit_resource.call_args_list]
+        self.assertEqual(
+            endpoints, ["teams", "escalation_policies", "services", "incidents"]
+        )
+        self.assertEqual(set(results), set(endpoints))
+
+    @patch(
+        "app.utils.store_page",
+        return_value={"inserted": 1, "updated": 0, "unchanged": 2},
+    )
+    @patch("app.utils.fetch_page")
+    def test_submit_resource_pages(self, mock_fetch_page, mock_store_page):
+        """Test that every page of a resource is stored as its own batch."""
+        mock_fetch_page.return_value = {"teams": [{}], "limit": 100, "total": 250}
+        results = fetch_and_store_all_data(self.app, workers=2, resources=["teams"])
+        self.assertEqual(mock_store_page.call_count, 3)
+        self.assertEqual(
+            results["teams"],
+            {"inserted": 3, "updated": 0, "unchanged": 6, "failed_pages": 0},
+        )
+
+    @patch("app.utils.fetch_page", return_value=None)
+    def test_failed_first_page(self, mock_fetch_page):
+        """Test that a failed first-page fetch is reported as a failed page."""
+        results = fetch_and_store_all_data(self.app, workers=2)
+        for counts in results.values():
+            self.assertEqual(counts["failed_pages"], 1)
+
+    @patch("app.utils.store_page", return_value=new_sync_counts())
+    @patch("app.utils.fetch_page")
+    def test_failed_page_during_walk(self, mock_fetch_page, mock_store_page):
+        """Test that a failed fetch while walking pages without a total is reported."""
+        mock_fetch_page.side_effect = [{"teams": [{}], "limit": 100, "more": True}, None]
+        results = fetch_and_store_all_data(self.app, workers=2, resources=["teams"])
+        self.assertEqual(mock_store_page.call_count, 1)
+        self.assertEqual(results["teams"]["failed_pages"], 1)
+
+    def test_store_page_retries_conflict(self):
+        """Test that a page hitting an IntegrityError is retried once."""
+        conflict = IntegrityError("INSERT", {}, Exception("duplicate key"))
+        store = Mock(side_effect=[conflict, new_sync_counts()])
+        with patch.dict("app.utils.SYNC_STORES", {"services": store}):
+            self.assertEqual(store_page(self.app, "services", []), new_sync_counts())
+            self.assertEqual(store.call_count, 2)
+
+            store.reset_mock(side_effect=True)
+            store.side_effect = [conflict, conflict]
+            self.assertIsNone(store_page(self.app, "services", []))
+
+    @patch("app.cli.fetch_and_store_all_data")
+    def test_sync_command_rejects_zero_workers(self, mock_fetch_and_store_all_data):
+        """Test that pd-sync validates the number of workers."""
+        result = self.app.test_cli_runner().invoke(sync_command, ["--workers", "0"])
+        self.assertEqual(result.exit_code, 2)
+        mock_fetch_and_store_all_data.assert_not_called()
+
+    def test_content_hash(self):
+        """Test that the content hash ignores key order and detects changes."""
+        record = {"id": "P1", "name": "Service", "teams": [{"id": "T1"}]}
+        reordered = {"teams": [{"id": "T1"}], "name": "Service", "id": "P1"}
+        self.assertEqual(content_hash(record), content_hash(reordered))
+        self.assertNotEqual(
+            content_hash(record), content_hash({**record, "name": "Renamed"})
+        )
+
+
+class TestStore(unittest.TestCase):
+    """Test cases for change detection in the store functions of utils.py"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def sync(self, store, records):
+        counts = store(records)
+        db.session.commit()
+        return counts
+
+    def team(self, n):
+        return {"id": f"T{n}", "name": f"team{n}", "summary": f"team{n}"}
+
+    def service(self, team_ids, **extra):
+        return {
+            "id": "S1",
+            "name": "Service 1",
+            "created_at": "2024-01-01T00:00:00+0000",
+            "updated_at": "2024-01-01T00:00:00+0000",
+            "status": "active",
+            "teams": [{"id": f"T{n}", "summary": f"T-summary{n}"} for n in team_ids],
+            **extra,
+        }
+
+    def incident(self, **extra):
+        return {
+            "incident_key": "K1",
+            "incident_number": 1,
+            "title": "Incident 1",
+            "status": "triggered",
+            "created_at": "2024-02-01T00:00:00Z",
+            "updated_at": "2024-02-01T00:00:00Z",
+            "service": {"id": "S1"},
+            **extra,
+        }
+
+    def test_inserted_unchanged_updated(self):
+        """Test the inserted, unchanged and updated paths."""
+        teams = [self.team(0), self.team(1)]
+        self.assertEqual(
+            self.sync(store_teams, teams), {"inserted": 2, "updated": 0, "unchanged": 0}
+        )
+        self.assertEqual(
+            self.sync(store_teams, teams), {"inserted": 0, "updated": 0, "unchanged": 2}
+        )
+        teams[1]["name"] = "renamed"
+        self.assertEqual(
+            self.sync(store_teams, teams), {"inserted": 0, "updated": 1, "unchanged": 1}
+        )
+        self.assertEqual(Team.query.get("T1").name, "renamed")
+
+    def test_volatile_fields_ignored(self):
+        """Test that upstream fields that are not stored do not cause updates."""
+        self.sync(store_teams, [self.team(0)])
+        self.sync(store_services, [self.service([0], last_incident_timestamp="a")])
+        counts = self.sync(
+            store_services, [self.service([0], last_incident_timestamp="b")]
+        )
+        self.assertEqual(counts["unchanged"], 1)
+
+        self.assertEqual(self.sync(store_incidents, [self.incident()])["inserted"], 1)
+        counts = self.sync(
+            store_incidents, [self.incident(pending_actions=[{"type": "escalate"}])]
+        )
+        self.assertEqual(counts["unchanged"], 1)
+        counts = self.sync(store_incidents, [self.incident(status="resolved")])
+        self.assertEqual(counts["updated"], 1)
+        self.assertEqual(Incident.query.get("K1").status, "resolved")
+
+    def test_service_team_diff(self):
+        """Test that team memberships are diffed and team details are untouched."""
+        self.sync(store_teams, [self.team(0), self.team(1), self.team(2)])
+        self.sync(store_services, [self.service([0, 1])])
+        self.assertEqual(
+            sorted(t.id for t in Service.query.get("S1").teams), ["T0", "T1"]
+        )
+
+        counts = self.sync(store_services, [self.service([1, 2])])
+        self.assertEqual(counts["updated"], 1)
+        self.assertEqual(
+            sorted(t.id for t in Service.query.get("S1").teams), ["T1", "T2"]
+        )
+        self.assertEqual(
+            [t.name for t in Team.query.order_by(Team.id)], ["team0", "team1", "team2"]
+        )
+        counts = self.sync(store_teams, [self.team(0), self.team(1), self.team(2)])
+        self.assertEqual(counts["unchanged"], 3)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,19 @@
 import requests
 from app.models import *
-import asyncio
-from sqlalchemy.exc import SQLAlchemyError
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from datetime import datetime
 import os
 
 # API configuration
 PAGERDUTY_API_KEY = os.getenv("PAGERDUTY_API_KEY")
 BASE_URL = os.getenv("BASE_URL")
+PAGE_LIMIT = int(os.getenv("PAGERDUTY_PAGE_LIMIT", "100"))
+
+# Sync configuration
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "4"))
 
 headers = {
     "Authorization": f"Token token={PAGERDUTY_API_KEY}",
@@ -15,11 +21,14 @@ headers = {
 }
 
 
-async def fetch_data(endpoint):
-    """Helper function to fetch data from PagerDuty API."""
+def fetch_page(endpoint, offset=0, limit=PAGE_LIMIT, total=False):
+    """Helper function to fetch one page of a PagerDuty API list endpoint."""
     url = f"{BASE_URL}/{endpoint}"
+    params = {"offset": offset, "limit": limit}
+    if total:
+        params["total"] = "true"
     try:
-        response = requests.get(url, headers=headers)
+        response = requests.get(url, headers=headers, params=params)
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
@@ -27,125 +36,391 @@ async def fetch_data(endpoint):
         return None
 
 
-async def fetch_and_store_services():
-    """Fetch and store services from PagerDuty."""
-    data = await fetch_data("services")
-    if data and "services" in data:
-        for service_data in data["services"]:
-            service = Service.query.get(service_data["id"]) or Service(
-                id=service_data["id"]
-            )
-            service.name = service_data["name"]
-            service.description = service_data.get("description")
-            service.created_at = datetime.strptime(
-                service_data.get("created_at"), "%Y-%m-%dT%H:%M:%S%z"
-            )
-            service.updated_at = datetime.strptime(
-                service_data.get("updated_at"), "%Y-%m-%dT%H:%M:%S%z"
-            )
-            service.status = service_data.get("status")
-            service.html_url = service_data.get("html_url")
-
-            # Handle the many-to-many relationship with teams
-            service.teams = []  # Clear existing teams
-            for team_data in service_data["teams"]:
-                team = Team.query.get(team_data["id"]) or Team(id=team_data["id"])
-                team.name = team_data.get("summary", team_data["id"])
-                team.html_url = team_data.get("html_url")
-                service.teams.append(team)
-
-            # Save or update the service in the database
-            db.session.merge(service)
+def content_hash(data):
+    """
+    Returns a stable SHA-256 hex digest of the stored fields of a record.
+
+    The digest is kept in the ``content_hash`` column of services, teams, incidents
+    and escalation policies. A sync skips a record when it is unchanged. It covers the
+    mapped column values plus the team ids of a service or the service id of an
+    incident.
+    """
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def existing_hashes(key_column, hash_column, keys, chunk_size=1000):
+    """
+    Loads the stored content hashes for the given keys in bulk.
+
+    Returns:
+        Dict mapping each stored key to its content hash.
+    """
+    keys = list(keys)
+    hashes = {}
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start : start + chunk_size]
+        hashes.update(
+            db.session.query(key_column, hash_column)
+            .filter(key_column.in_(chunk))
+            .all()
+        )
+    return hashes
+
+
+def new_sync_counts():
+    """Returns an empty inserted/updated/unchanged counter."""
+    return {"inserted": 0, "updated": 0, "unchanged": 0}
+
+
+# Each mapper returns the column values stored for an upstream record. Only these
+# values are hashed, so volatile upstream fields (e.g. last_incident_timestamp)
+# do not turn unchanged rows into updates.
+
+
+def service_fields(service_data):
+    """Maps a PagerDuty service to the columns stored in ``services``."""
+    return {
+        "name": service_data["name"],
+        "description": service_data.get("description"),
+        "created_at": datetime.strptime(
+            service_data.get("created_at"), "%Y-%m-%dT%H:%M:%S%z"
+        ),
+        "updated_at": datetime.strptime(
+            service_data.get("updated_at"), "%Y-%m-%dT%H:%M:%S%z"
+        ),
+        "status": service_data.get("status"),
+        "html_url": service_data.get("html_url"),
+    }
 
-        try:
-            db.session.commit()
-        except SQLAlchemyError as e:
-            db.session.rollback()
-            print(f"Error saving services to DB: {e}")
-
-
-async def fetch_and_store_incidents():
-    """Fetch and store incidents from PagerDuty."""
-    data = await fetch_data("incidents")
-    if data and "incidents" in data:
-        for incident_data in data["incidents"]:
-            incident = (
-                Incident.query.filter_by(
-                    incident_number=incident_data["incident_number"]
-                ).first()
-                or Incident()
-            )
-            incident.id = incident_data["incident_key"]
-            incident.incident_number = incident_data["incident_number"]
-            incident.title = incident_data["title"]
-            incident.description = incident_data.get("description")
-            incident.status = incident_data["status"]
-            incident.created_at = datetime.strptime(
-                incident_data["created_at"], "%Y-%m-%dT%H:%M:%SZ"
-            )
-            incident.updated_at = datetime.strptime(
-                incident_data["updated_at"], "%Y-%m-%dT%H:%M:%SZ"
-            )
-            service_data = incident_data.get("service")
-            if service_data:
-                service = Service.query.get(service_data["id"])
-                if service:
-                    incident.service = service
-
-            # Save to database
-            db.session.merge(incident)
-        try:
-            db.session.commit()
-        except SQLAlchemyError as e:
-            db.session.rollback()
-            print(f"Error saving incidents to DB: {e}")
 
+def incident_fields(incident_data):
+    """Maps a PagerDuty incident to the columns stored in ``incidents``."""
+    return {
+        "id": incident_data["incident_key"],
+        "incident_number": incident_data["incident_number"],
+        "title": incident_data["title"],
+        "description": incident_data.get("description"),
+        "status": incident_data["status"],
+        "created_at": datetime.strptime(
+            incident_data["created_at"], "%Y-%m-%dT%H:%M:%SZ"
+        ),
+        "updated_at": datetime.strptime(
+            incident_data["updated_at"], "%Y-%m-%dT%H:%M:%SZ"
+        ),
+    }
+
+
+def team_fields(team_data):
+    """Maps a PagerDuty team to the columns stored in ``teams``."""
+    return {
+        "name": team_data["name"],
+        "summary": team_data.get("summary"),
+        "html_url": team_data.get("html_url"),
+    }
+
+
+def escalation_policy_fields(policy_data):
+    """Maps a PagerDuty escalation policy to the columns stored in ``escalation_policies``."""
+    return {
+        "name": policy_data["name"],
+        "summary": policy_data["summary"],
+        "description": policy_data.get("description"),
+    }
+
+
+def apply_fields(obj, fields, digest):
+    """Assigns mapped column values and the content hash to a model instance."""
+    for column, value in fields.items():
+        setattr(obj, column, value)
+    obj.content_hash = digest
+
+
+def store_services(records):
+    """
+    Store services, skipping records whose content hash has not changed.
+
+    Team memberships of changed services are diffed, so only added or removed
+    association rows are written. Team details are left to ``store_teams``.
+
+    Returns:
+        Dict with the number of inserted, updated and unchanged services.
+    """
+    counts = new_sync_counts()
+    hashes = existing_hashes(
+        Service.id, Service.content_hash, [s["id"] for s in records]
+    )
+    for service_data in records:
+        fields = service_fields(service_data)
+        team_ids = {team_data["id"] for team_data in service_data["teams"]}
+        digest = content_hash({**fields, "team_ids": sorted(team_ids)})
+        if service_data["id"] in hashes:
+            if hashes[service_data["id"]] == digest:
+                counts["unchanged"] += 1
+                continue
+            service = Service.query.get(service_data["id"])
+            counts["updated"] += 1
+        else:
+            service = Service(id=service_data["id"])
+            db.session.add(service)
+            counts["inserted"] += 1
+        apply_fields(service, fields, digest)
+
+        # Diff the many-to-many relationship with teams instead of rebuilding it
+        for team in list(service.teams):
+            if team.id not in team_ids:
+                service.teams.remove(team)
+        current_team_ids = {team.id for team in service.teams}
+        for team_data in service_data["teams"]:
+            if team_data["id"] in current_team_ids:
+                continue
+            team = Team.query.get(team_data["id"])
+            if team is None:
+                # Stub until the teams sync stores the real record; it has no
+                # content hash, so that sync always overwrites it
+                team = Team(
+                    id=team_data["id"], name=team_data.get("summary", team_data["id"])
+                )
+                db.session.add(team)
+            service.teams.append(team)
+            current_team_ids.add(team.id)
+    return counts
+
+
+def store_incidents(records):
+    """
+    Store incidents, skipping records whose content hash has not changed.
+
+    Returns:
+        Dict with the number of inserted, updated and unchanged incidents.
+    """
+    counts = new_sync_counts()
+    hashes = existing_hashes(
+        Incident.incident_number,
+        Incident.content_hash,
+        [i["incident_number"] for i in records],
+    )
+    for incident_data in records:
+        fields = incident_fields(incident_data)
+        service_data = incident_data.get("service")
+        service_id = service_data["id"] if service_data else None
+        digest = content_hash({**fields, "service_id": service_id})
+        if incident_data["incident_number"] in hashes:
+            if hashes[incident_data["incident_number"]] == digest:
+                counts["unchanged"] += 1
+                continue
+            incident = Incident.query.filter_by(
+                incident_number=incident_data["incident_number"]
+            ).first()
+            counts["updated"] += 1
+        else:
+            incident = Incident()
+            counts["inserted"] += 1
+        apply_fields(incident, fields, digest)
 
-async def fetch_and_store_teams():
-    """Fetch and store teams from PagerDuty."""
-    data = await fetch_data("teams")
-    if data and "teams" in data:
-        for team_data in data["teams"]:
-            team = Team.query.get(team_data["id"]) or Team(id=team_data["id"])
-            team.name = team_data["name"]
-            team.summary = team_data.get("summary")
-            team.html_url = team_data.get("html_url")
+        if service_id:
+            service = Service.query.get(service_id)
+            if service:
+                incident.service = service
+        db.session.add(incident)
+    return counts
 
-            # Save to database
-            db.session.merge(team)
+
+def store_teams(records):
+    """
+    Store teams, skipping records whose content hash has not changed.
+
+    Returns:
+        Dict with the number of inserted, updated and unchanged teams.
+    """
+    counts = new_sync_counts()
+    hashes = existing_hashes(Team.id, Team.content_hash, [t["id"] for t in records])
+    for team_data in records:
+        fields = team_fields(team_data)
+        digest = content_hash(fields)
+        if team_data["id"] in hashes:
+            if hashes[team_data["id"]] == digest:
+                counts["unchanged"] += 1
+                continue
+            team = Team.query.get(team_data["id"])
+            counts["updated"] += 1
+        else:
+            team = Team(id=team_data["id"])
+            db.session.add(team)
+            counts["inserted"] += 1
+        apply_fields(team, fields, digest)
+    return counts
+
+
+def store_escalation_policies(records):
+    """
+    Store escalation policies, skipping records whose content hash has not changed.
+
+    Returns:
+        Dict with the number of inserted, updated and unchanged escalation policies.
+    """
+    counts = new_sync_counts()
+    hashes = existing_hashes(
+        EscalationPolicy.id, EscalationPolicy.content_hash, [p["id"] for p in records]
+    )
+    for policy_data in records:
+        fields = escalation_policy_fields(policy_data)
+        digest = content_hash(fields)
+        if policy_data["id"] in hashes:
+            if hashes[policy_data["id"]] == digest:
+                counts["unchanged"] += 1
+                continue
+            policy = EscalationPolicy.query.get(policy_data["id"])
+            counts["updated"] += 1
+        else:
+            policy = EscalationPolicy(id=policy_data["id"])
+            db.session.add(policy)
+            counts["inserted"] += 1
+        apply_fields(policy, fields, digest)
+    return counts
+
+
+# Resources synced in order: services reference teams and incidents reference
+# services, so each stage starts once the previous one is stored. Resources
+# within a stage run in parallel.
+SYNC_STAGES = [
+    ["teams", "escalation_policies"],
+    ["services"],
+    ["incidents"],
+]
+
+SYNC_STORES = {
+    "teams": store_teams,
+    "escalation_policies": store_escalation_policies,
+    "services": store_services,
+    "incidents": store_incidents,
+}
+
+
+def store_page(app, endpoint, records):
+    """
+    Store one page of records in its own session and commit it.
+
+    ``db.session`` is scoped per thread, so each worker gets an isolated session and
+    a failed page only rolls back itself.
+
+    A page that hits an IntegrityError is retried once. Two service pages handled in
+    parallel can both create the same missing stub team; on retry the lookup finds
+    the team the other page committed.
+
+    Returns:
+        Dict with inserted/updated/unchanged counts, or None if the commit failed.
+    """
+    with app.app_context():
         try:
-            db.session.commit()
+            for attempt in range(2):
+                try:
+                    counts = SYNC_STORES[endpoint](records)
+                    db.session.commit()
+                    return counts
+                except IntegrityError as e:
+                    db.session.rollback()
+                    if attempt == 1:
+                        raise
+                    print(f"Retrying {endpoint} page after conflict: {e}")
         except SQLAlchemyError as e:
             db.session.rollback()
-            print(f"Error saving teams to DB: {e}")
-
-
-async def fetch_and_store_escalation_policies():
-    """Fetch and store escalation policies from PagerDuty."""
-    data = await fetch_data("escalation_policies")
-    if data and "escalation_policies" in data:
-        for policy_data in data["escalation_policies"]:
-            policy = EscalationPolicy.query.get(policy_data["id"]) or EscalationPolicy(
-                id=policy_data["id"]
-            )
-            policy.name = policy_data["name"]
-            policy.summary = policy_data["summary"]
-            policy.description = policy_data.get("description")
-
-            # Save to database
-            db.session.merge(policy)
+            print(f"Error saving {endpoint} to DB: {e}")
+            return None
+        finally:
+            db.session.remove()
+
+
+def sync_page(app, endpoint, offset):
+    """Fetch and store the page of ``endpoint`` starting at ``offset``."""
+    data = fetch_page(endpoint, offset)
+    if not data or endpoint not in data:
+        return None
+    return store_page(app, endpoint, data[endpoint])
+
+
+def submit_resource(app, executor, endpoint):
+    """
+    Schedule the sync of every page of one resource on ``executor``.
+
+    The first page is fetched here to learn the total; the remaining pages are
+    fetched and stored by the workers.
+
+    Returns:
+        Tuple of the list of futures, one per scheduled page, and the number of pages
+        that could not be fetched here.
+    """
+    data = fetch_page(endpoint, total=True)
+    if not data or endpoint not in data:
+        return [], 1
+    futures = [executor.submit(store_page, app, endpoint, data[endpoint])]
+    limit = data.get("limit") or PAGE_LIMIT
+    if data.get("total") is not None:
+        for offset in range(limit, data["total"], limit):
+            futures.append(executor.submit(sync_page, app, endpoint, offset))
+    else:
+        # Without a total, walk the pages here and hand each one to the workers
+        offset = 0
+        while data.get("more"):
+            offset += limit
+            data = fetch_page(endpoint, offset)
+            if not data or endpoint not in data:
+                # The rest of the resource is unknown, so report it as failed
+                return futures, 1
+            futures.append(executor.submit(store_page, app, endpoint, data[endpoint]))
+    return futures, 0
+
+
+def collect_counts(futures, failed_fetches=0):
+    """
+    Sum the page counts of one resource.
+
+    Returns:
+        Dict with inserted/updated/unchanged counts and the number of failed pages.
+    """
+    counts = new_sync_counts()
+    counts["failed_pages"] = failed_fetches
+    for future in futures:
         try:
-            db.session.commit()
-        except SQLAlchemyError as e:
-            db.session.rollback()
-            print(f"Error saving escalation policies to DB: {e}")
+            page_counts = future.result()
+        except Exception as e:
+            # A malformed page must not abort the other pages and resources
+            print(f"Error syncing page: {e}")
+            page_counts = None
+        if page_counts is None:
+            counts["failed_pages"] += 1
+            continue
+        for key, value in page_counts.items():
+            counts[key] += value
+    return counts
 
 
-async def fetch_and_store_all_data():
-    """Fetch and store all data from PagerDuty."""
-    await asyncio.gather(
-        fetch_and_store_services(),
-        fetch_and_store_incidents(),
-        fetch_and_store_teams(),
-        fetch_and_store_escalation_policies(),
-    )
+def fetch_and_store_all_data(app, workers=SYNC_WORKERS, resources=None):
+    """
+    Fetch and store all data from PagerDuty using a pool of worker threads.
+
+    Args:
+        app: Flask application the workers push their app context for.
+        workers: Number of worker threads.
+        resources: Optional subset of resources to sync; defaults to all of them.
+
+    Returns:
+        Dict mapping each resource to its inserted/updated/unchanged counts and
+        number of failed pages.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for stage in SYNC_STAGES:
+            pending = {
+                endpoint: submit_resource(app, executor, endpoint)
+                for endpoint in stage
+                if resources is None or endpoint in resources
+            }
+            for endpoint, (futures, failed_fetches) in pending.items():
+                results[endpoint] = collect_counts(futures, failed_fetches)
+    return results
+
+
+def sync_failed(results):
+    """Returns True if any resource in a sync result has failed pages."""
+    return any(counts["failed_pages"] > 0 for counts in results.values())
@@ -0,0 +1,75 @@
+"""
+Benchmarks bytes-on-wire and encode time of the list endpoint response formats.
+
+Builds a payload shaped like ``GET /api/incidents`` and compares Flask's stdlib JSON
+(what ``jsonify`` produces) with the orjson and MessagePack encoders used by
+``app.encoding``, each uncompressed and with gzip and brotli. ``step ms`` is the
+serialization time for identity rows and the compression time otherwise.
+
+Usage, from the repository root:
+    python -m benchmarks.bench_encoding --rows 100000
+"""
+import argparse
+import json
+import time
+from app.encoding import BROTLI_QUALITY, GZIP_LEVEL, compress, serialize
+
+
+def build_payload(rows):
+    """Builds ``rows`` incident records like the /api/incidents response."""
+    statuses = ["triggered", "acknowledged", "resolved"]
+    return [
+        {
+            "id": f"Q{n:013X}",
+            "status": statuses[n % len(statuses)],
+            "service_id": f"P{n % 250:06d}",
+        }
+        for n in range(rows)
+    ]
+
+
+def jsonify_dumps(payload):
+    """Serializes ``payload`` the way Flask's ``jsonify`` does outside debug mode."""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")) + "\n"
+    return body.encode("utf-8")
+
+
+def timed(func, *args, repeat=5):
+    """Returns the result of ``func`` and its best wall time in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = build_payload(args.rows)
+    encoders = [
+        ("jsonify (stdlib json)", lambda p: jsonify_dumps(p)),
+        ("orjson", lambda p: serialize(p, "application/json")),
+        ("msgpack", lambda p: serialize(p, "application/msgpack")),
+    ]
+
+    print(f"{args.rows} rows, gzip level {GZIP_LEVEL}, brotli quality {BROTLI_QUALITY}")
+    print(f"{'format':<24}{'coding':<10}{'bytes':>12}{'step ms':>12}{'total ms':>12}")
+    for name, encoder in encoders:
+        body, encode_ms = timed(encoder, payload, repeat=args.repeat)
+        print(f"{name:<24}{'identity':<10}{len(body):>12}{encode_ms:>12.1f}{encode_ms:>12.1f}")
+        for coding in ("gzip", "br"):
+            compressed, compress_ms = timed(compress, body, coding, repeat=args.repeat)
+            print(
+                f"{name:<24}{coding:<10}{len(compressed):>12}"
+                f"{compress_ms:>12.1f}{encode_ms + compress_ms:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()